@@ -1,30 +1,286 @@
+import argparse
 import asyncio
+import bisect
+import cProfile
 import json
 import os
+import random
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager, nullcontext
 from datetime import datetime
+from types import SimpleNamespace
 from typing import Any, Dict, List, Optional
 
 import aiohttp
+from aiohttp import web
 from dotenv import load_dotenv
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
 
 # Load environment variables
 load_dotenv()
 
 
+class TimelineTracer:
+    """Records a Chrome trace-event (Perfetto compatible) timeline"""
+
+    def __init__(self):
+        """
+        Initialize an empty timeline starting now
+        """
+        self._origin = time.perf_counter()
+        self._events = []
+        self._lanes = {}
+
+    def now(self) -> float:
+        """
+        Current timeline timestamp in microseconds
+        """
+        return (time.perf_counter() - self._origin) * 1_000_000
+
+    def _lane(self, merchant_id: Optional[str]) -> int:
+        # One timeline row per merchant, plus one for portfolio-wide calls
+        key = merchant_id or "portfolio"
+        if key not in self._lanes:
+            self._lanes[key] = len(self._lanes) + 1
+            self._events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": self._lanes[key],
+                    "args": {"name": key},
+                }
+            )
+        return self._lanes[key]
+
+    def add_span(
+        self,
+        name: str,
+        category: str,
+        merchant_id: Optional[str],
+        start: float,
+        end: float,
+        **args: Any,
+    ):
+        """
+        Record a completed span
+
+        Args:
+            name: Span name shown on the timeline
+            category: Span category (merchant, endpoint or phase)
+            merchant_id: Merchant the span belongs to, if any
+            start: Start timestamp from now()
+            end: End timestamp from now()
+            args: Extra details attached to the span
+        """
+        self._events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round(start, 3),
+                "dur": round(max(end - start, 0.0), 3),
+                "pid": 1,
+                "tid": self._lane(merchant_id),
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def span(
+        self, name: str, category: str, merchant_id: Optional[str], **args: Any
+    ):
+        """
+        Record a span around the wrapped block
+
+        Args:
+            name: Span name shown on the timeline
+            category: Span category (merchant, endpoint or phase)
+            merchant_id: Merchant the span belongs to, if any
+            args: Extra details attached to the span
+        """
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add_span(
+                name, category, merchant_id, start, self.now(), **args
+            )
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """
+        Build an aiohttp trace config that records connect and wait phases
+
+        Returns:
+            Trace config to pass to aiohttp.ClientSession
+        """
+
+        async def on_request_start(session, ctx, params):
+            ctx.start = self.now()
+            ctx.connected = None
+
+        async def on_connection_ready(session, ctx, params):
+            ctx.connected = self.now()
+
+        def record_phases(ctx, **args):
+            request = ctx.trace_request_ctx
+            if not isinstance(request, SimpleNamespace):
+                return
+            end = self.now()
+            if ctx.connected is None:
+                # Failed before a connection was ready: it is all connect
+                self.add_span(
+                    "connect",
+                    request.endpoint,
+                    request.merchant_id,
+                    ctx.start,
+                    end,
+                    **args,
+                )
+                return
+            self.add_span(
+                "connect",
+                request.endpoint,
+                request.merchant_id,
+                ctx.start,
+                ctx.connected,
+            )
+            self.add_span(
+                "wait",
+                request.endpoint,
+                request.merchant_id,
+                ctx.connected,
+                end,
+                stage="headers",
+                **args,
+            )
+
+        async def on_request_end(session, ctx, params):
+            if ctx.connected is None:
+                ctx.connected = ctx.start
+            record_phases(ctx, status=params.response.status)
+
+        async def on_request_exception(session, ctx, params):
+            record_phases(
+                ctx,
+                error=type(params.exception).__name__,
+                message=str(params.exception),
+            )
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_ready)
+        trace_config.on_connection_reuseconn.append(on_connection_ready)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    def save(self, filename: str):
+        """
+        Save the timeline as a Chrome trace-event JSON file
+
+        Args:
+            filename: The filename to save the trace to
+        """
+        try:
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"traceEvents": self._events, "displayTimeUnit": "ms"}, f
+                )
+            print(f"Profile trace saved successfully to {filename}")
+        except Exception as e:
+            print(f"Error saving profile trace to {filename}: {e}")
+
+
+class FairRequestScheduler:
+    """Global in-flight request budget shared round-robin across tenants"""
+
+    def __init__(self, limit: int):
+        """
+        Initialize the scheduler
+
+        Args:
+            limit: Maximum number of requests in flight across all tenants
+        """
+        if limit < 1:
+            raise ValueError("Request limit must be at least 1")
+        self._available = limit
+        self._waiters = OrderedDict()
+
+    @asynccontextmanager
+    async def slot(self, tenant: str):
+        """
+        Hold one request slot for the wrapped block
+
+        Args:
+            tenant: The tenant the request is made for
+        """
+        await self._acquire(tenant)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, tenant: str):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(tenant, deque()).append(waiter)
+        self._wake()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Hand the slot on if it was granted just before cancellation
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        self._available += 1
+        self._wake()
+
+    def _wake(self):
+        # Grant one slot per tenant in turn, so a tenant with a long backlog
+        # cannot starve tenants that only have a few requests waiting
+        while self._available > 0 and self._waiters:
+            tenant, waiters = self._waiters.popitem(last=False)
+            waiter = waiters.popleft()
+            if waiters:
+                self._waiters[tenant] = waiters
+            if waiter.cancelled():
+                continue
+            self._available -= 1
+            waiter.set_result(None)
+
+
 class PayEngineMerchantAPI:
     """Class to handle PayEngine API calls for merchant data"""
 
-    def __init__(self, base_url: str, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str] = None,
+        tracer: Optional[TimelineTracer] = None,
+        connector: Optional[aiohttp.BaseConnector] = None,
+        scheduler: Optional[FairRequestScheduler] = None,
+        tenant: str = "default",
+    ):
         """
         Initialize the PayEngine API client
 
         Args:
             base_url: The base URL of the PayEngine API
             api_key: Optional API key for authentication
+            tracer: Optional timeline tracer used in profiling mode
+            connector: Optional connection pool shared with other clients
+            scheduler: Optional request budget shared with other clients
+            tenant: Name this client's requests are scheduled under
         """
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
+        self.tracer = tracer
+        self.connector = connector
+        self.scheduler = scheduler
+        self.tenant = tenant
         self.session = None
 
     async def __aenter__(self):
@@ -42,7 +298,13 @@ class PayEngineMerchantAPI:
         if self.api_key:
             headers["Authorization"] = f"Basic {self.api_key}"
 
-        self.session = aiohttp.ClientSession(headers=headers)
+        trace_configs = [self.tracer.trace_config()] if self.tracer else None
+        self.session = aiohttp.ClientSession(
+            headers=headers,
+            trace_configs=trace_configs,
+            connector=self.connector,
+            connector_owner=self.connector is None,
+        )
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -50,6 +312,46 @@ class PayEngineMerchantAPI:
         if self.session:
             await self.session.close()
 
+    def _span(
+        self, name: str, category: str, merchant_id: Optional[str], **args: Any
+    ):
+        """Timeline span when profiling, otherwise a no-op context"""
+        if self.tracer:
+            return self.tracer.span(name, category, merchant_id, **args)
+        return nullcontext()
+
+    @asynccontextmanager
+    async def _get(
+        self, url: str, endpoint: str, merchant_id: Optional[str] = None
+    ):
+        """GET request, traced as one endpoint span when profiling"""
+        slot = (
+            self.scheduler.slot(self.tenant)
+            if self.scheduler
+            else nullcontext()
+        )
+        async with slot:
+            with self._span(endpoint, "endpoint", merchant_id, url=url):
+                async with self.session.get(
+                    url,
+                    trace_request_ctx=SimpleNamespace(
+                        endpoint=endpoint, merchant_id=merchant_id
+                    ),
+                ) as response:
+                    yield response
+
+    async def _json(
+        self,
+        response: aiohttp.ClientResponse,
+        endpoint: str,
+        merchant_id: Optional[str] = None,
+    ) -> Any:
+        """Read and decode a JSON body, tracing body wait and decode phases"""
+        with self._span("wait", endpoint, merchant_id, stage="body"):
+            await response.read()
+        with self._span("decode", endpoint, merchant_id):
+            return await response.json()
+
     async def get_merchants(self) -> List[Dict[str, Any]]:
         """
         Get all merchants from the PayEngine API
@@ -60,9 +362,9 @@ class PayEngineMerchantAPI:
         url = f"{self.base_url}/api/merchant"
 
         try:
-            async with self.session.get(url) as response:
+            async with self._get(url, "merchants") as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = await self._json(response, "merchants")
                     # Expecting a dict with a 'data' key
                     if (
                         isinstance(data, dict)
@@ -98,9 +400,9 @@ class PayEngineMerchantAPI:
         url = f"{self.base_url}/api/merchant/{merchant_id}"
 
         try:
-            async with self.session.get(url) as response:
+            async with self._get(url, "details", merchant_id) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = await self._json(response, "details", merchant_id)
                     print(
                         f"Successfully retrieved details for merchant {merchant_id}"
                     )
@@ -132,9 +434,9 @@ class PayEngineMerchantAPI:
         url = f"{self.base_url}/api/merchant/{merchant_id}/document"
 
         try:
-            async with self.session.get(url) as response:
+            async with self._get(url, "documents", merchant_id) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = await self._json(response, "documents", merchant_id)
                     print(
                         f"Successfully retrieved documents for merchant {merchant_id}"
                     )
@@ -168,9 +470,13 @@ class PayEngineMerchantAPI:
         url = f"{self.base_url}/api/v2/merchant/{merchant_id}/bank-accounts"
 
         try:
-            async with self.session.get(url) as response:
+            async with self._get(
+                url, "bank_accounts", merchant_id
+            ) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = await self._json(
+                        response, "bank_accounts", merchant_id
+                    )
                     print(
                         f"Successfully retrieved bank accounts for merchant {merchant_id}"
                     )
@@ -202,9 +508,9 @@ class PayEngineMerchantAPI:
         url = f"{self.base_url}/api/merchant/{merchant_id}/devices"
 
         try:
-            async with self.session.get(url) as response:
+            async with self._get(url, "devices", merchant_id) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = await self._json(response, "devices", merchant_id)
                     print(
                         f"Successfully retrieved devices for merchant {merchant_id}"
                     )
@@ -238,9 +544,13 @@ class PayEngineMerchantAPI:
         url = f"{self.base_url}/api/merchant/{merchant_id}/payment-link"
 
         try:
-            async with self.session.get(url) as response:
+            async with self._get(
+                url, "payment_links", merchant_id
+            ) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = await self._json(
+                        response, "payment_links", merchant_id
+                    )
                     print(
                         f"Successfully retrieved payment links for merchant {merchant_id}"
                     )
@@ -274,9 +584,13 @@ class PayEngineMerchantAPI:
         url = f"{self.base_url}/api/merchant/{merchant_id}/recurring-payments/plans"
 
         try:
-            async with self.session.get(url) as response:
+            async with self._get(
+                url, "recurring_payment_plans", merchant_id
+            ) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = await self._json(
+                        response, "recurring_payment_plans", merchant_id
+                    )
                     print(
                         f"Successfully retrieved recurring payment plans for merchant {merchant_id}"
                     )
@@ -308,9 +622,9 @@ class PayEngineMerchantAPI:
         url = f"{self.base_url}/api/merchant/{merchant_id}/gateways"
 
         try:
-            async with self.session.get(url) as response:
+            async with self._get(url, "gateways", merchant_id) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = await self._json(response, "gateways", merchant_id)
                     print(
                         f"Successfully retrieved gateways for merchant {merchant_id}"
                     )
@@ -344,15 +658,20 @@ class PayEngineMerchantAPI:
         url = f"{self.base_url}/api/merchant/{merchant_id}/transaction"
 
         try:
-            async with self.session.get(url) as response:
+            async with self._get(url, "transactions", merchant_id) as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = await self._json(
+                        response, "transactions", merchant_id
+                    )
                     print(
                         f"Successfully retrieved transactions for merchant {merchant_id}"
                     )
                     
                     # Process transactions to create monthly summaries
-                    processed_data = self._process_transactions(data, merchant_id)
+                    with self._span("process", "transactions", merchant_id):
+                        processed_data = self._process_transactions(
+                            data, merchant_id
+                        )
                     return processed_data
                 else:
                     print(
@@ -458,8 +777,514 @@ class PayEngineMerchantAPI:
         return result
 
 
+class PortfolioRollups:
+    """Incrementally maintained portfolio aggregates by group and parent merchant"""
+
+    # Merchant fields the portfolio is rolled up by
+    DIMENSIONS = ("group_id", "group_name", "parent_merchant_id")
+
+    # Bucket key used for merchants that have no value for a dimension
+    UNASSIGNED = "unassigned"
+
+    def __init__(self):
+        """
+        Initialize empty rollups for every dimension
+        """
+        self._buckets = {
+            dimension: defaultdict(self._new_bucket)
+            for dimension in self.DIMENSIONS
+        }
+
+    @staticmethod
+    def _new_bucket() -> Dict[str, Any]:
+        return {
+            "merchant_count": 0,
+            "total_amount": 0.0,
+            "total_fees": 0.0,
+            "total_transactions": 0,
+            "monthly": defaultdict(
+                lambda: {"amount": 0.0, "fees": 0.0, "count": 0}
+            ),
+        }
+
+    def add_merchant(
+        self, merchant: Dict[str, Any], transactions: Optional[Dict[str, Any]]
+    ):
+        """
+        Fold one merchant's processed transactions into the rollups
+
+        The merchant's summary values are already rounded to cents by
+        _process_transactions, so portfolio totals are sums of rounded
+        values and can differ from rounding the raw transaction sums by
+        up to half a cent per merchant.
+
+        Args:
+            merchant: Merchant fields from the merchant list
+            transactions: Result of _process_transactions for the merchant
+        """
+        self._fold(merchant, transactions, 1)
+
+    def remove_merchant(
+        self, merchant: Dict[str, Any], transactions: Optional[Dict[str, Any]]
+    ):
+        """
+        Take a previously added merchant back out of the rollups
+
+        Args:
+            merchant: Merchant fields the merchant was added with
+            transactions: Transactions the merchant was added with
+        """
+        self._fold(merchant, transactions, -1)
+
+    def _fold(
+        self,
+        merchant: Dict[str, Any],
+        transactions: Optional[Dict[str, Any]],
+        sign: int,
+    ):
+        has_summary = isinstance(transactions, dict) and not transactions.get(
+            "error"
+        )
+        summary = (
+            transactions.get("successful_payments_summary", {})
+            if has_summary
+            else {}
+        )
+        monthly_transactions = (
+            transactions.get("monthly_transactions", []) if has_summary else []
+        )
+
+        for dimension in self.DIMENSIONS:
+            key = merchant.get(dimension)
+            key = str(key) if key is not None else self.UNASSIGNED
+            bucket = self._buckets[dimension][key]
+            bucket["merchant_count"] += sign
+            bucket["total_amount"] += sign * summary.get("total_amount", 0.0)
+            bucket["total_fees"] += sign * summary.get("total_fees", 0.0)
+            bucket["total_transactions"] += sign * summary.get(
+                "total_transactions", 0
+            )
+
+            for month in monthly_transactions:
+                monthly = bucket["monthly"][month["month"]]
+                monthly["amount"] += sign * month.get(
+                    "total_successful_volume", 0.0
+                )
+                monthly["fees"] += sign * month.get("fees", 0.0)
+                monthly["count"] += sign * month.get("transaction_count", 0)
+                if monthly["count"] <= 0:
+                    del bucket["monthly"][month["month"]]
+
+            if bucket["merchant_count"] <= 0:
+                del self._buckets[dimension][key]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Build the rollups in the same shape as the per-merchant summaries
+
+        Returns:
+            Dictionary keyed by "by_<dimension>" with one entry per bucket
+        """
+        result = {}
+        for dimension, buckets in self._buckets.items():
+            rollup = {}
+            for key, bucket in sorted(buckets.items()):
+                rollup[key] = {
+                    "merchant_count": bucket["merchant_count"],
+                    "successful_payments_summary": {
+                        "total_amount": round(bucket["total_amount"], 2),
+                        "total_fees": round(bucket["total_fees"], 2),
+                        "total_transactions": bucket["total_transactions"],
+                    },
+                    "monthly_transactions": [
+                        {
+                            "month": month,
+                            "total_successful_volume": round(data["amount"], 2),
+                            "fees": round(data["fees"], 2),
+                            "transaction_count": data["count"],
+                        }
+                        for month, data in sorted(bucket["monthly"].items())
+                    ],
+                }
+            result[f"by_{dimension}"] = rollup
+        return result
+
+
+# Merchant ids returned by MerchantSearchIndex.query unless asked otherwise
+DEFAULT_SEARCH_LIMIT = 100
+
+_NON_ZERO_BYTE = re.compile(rb"[^\x00]")
+
+
+class MerchantSearchIndex:
+    """In-memory search index over the merchant fields of a snapshot"""
+
+    # Fields searchable by prefix and substring
+    TEXT_FIELDS = ("name", "email", "mid", "external_id")
+
+    # Fields merchants are filtered and counted by
+    FACET_FIELDS = ("status", "processing_status", "bank_account_verification")
+
+    def __init__(self, merchants: List[Dict[str, Any]]):
+        """
+        Build the index
+
+        Args:
+            merchants: Merchant rows in the merchant_data.json format
+        """
+        self.merchant_ids = [row.get("merchant_id") for row in merchants]
+        self._all = (1 << len(merchants)) - 1
+        facet_values = {field: [] for field in self.FACET_FIELDS}
+
+        # Per text field: values and positions sorted by value for prefix
+        # lookups, trigram posting lists for substring lookups, and the
+        # normalized value of every position
+        self._sorted_values = {}
+        self._sorted_positions = {}
+        pairs = {field: [] for field in self.TEXT_FIELDS}
+        self._trigrams = {
+            field: defaultdict(set) for field in self.TEXT_FIELDS
+        }
+        self._values = {field: [] for field in self.TEXT_FIELDS}
+
+        for position, row in enumerate(merchants):
+            merchant = row.get("merchant_data") or {}
+            for field in self.TEXT_FIELDS:
+                value = self._normalize(merchant.get(field))
+                self._values[field].append(value)
+                if not value:
+                    continue
+                pairs[field].append((value, position))
+                for trigram in self._trigrams_of(value):
+                    self._trigrams[field][trigram].add(position)
+            for field in self.FACET_FIELDS:
+                facet_values[field].append(merchant.get(field))
+
+        for field, field_pairs in pairs.items():
+            field_pairs.sort()
+            self._sorted_values[field] = [value for value, _ in field_pairs]
+            self._sorted_positions[field] = [p for _, p in field_pairs]
+
+        # Per facet field: value -> bitmap of positions, as a Python int
+        self._facets = self._facet_bitmaps(
+            facet_values, range(len(merchants))
+        )
+
+        # The same facet bitmaps over each text field's sorted order, so a
+        # prefix range is a contiguous run of bits and can be filtered and
+        # counted without converting it to positions
+        self._rank_facets = {
+            field: self._facet_bitmaps(
+                facet_values, self._sorted_positions[field]
+            )
+            for field in self.TEXT_FIELDS
+        }
+        self._rank_of = {}
+        for field in self.TEXT_FIELDS:
+            rank_of = [-1] * len(merchants)
+            for rank, position in enumerate(self._sorted_positions[field]):
+                rank_of[position] = rank
+            self._rank_of[field] = rank_of
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> "MerchantSearchIndex":
+        """
+        Build the index for a merchant_data.json snapshot
+
+        Args:
+            snapshot: Merchant data in the merchant_data.json format
+
+        Returns:
+            The search index
+        """
+        return cls(snapshot.get("merchants") or [])
+
+    def _facet_bitmaps(
+        self, facet_values: Dict[str, List[Any]], order
+    ) -> Dict[str, Dict[Any, int]]:
+        # Bit i of each bitmap stands for the merchant at order[i]
+        bitmaps = {}
+        for field in self.FACET_FIELDS:
+            values = facet_values[field]
+            buffers = {}
+            for bit, position in enumerate(order):
+                value = values[position]
+                if value not in buffers:
+                    buffers[value] = bytearray(len(self.merchant_ids) // 8 + 1)
+                buffers[value][bit >> 3] |= 1 << (bit & 7)
+            bitmaps[field] = {
+                value: int.from_bytes(buffer, "little")
+                for value, buffer in buffers.items()
+            }
+        return bitmaps
+
+    @staticmethod
+    def _normalize(value: Any) -> str:
+        return str(value).strip().lower() if value is not None else ""
+
+    @staticmethod
+    def _trigrams_of(value: str) -> set:
+        return {value[i : i + 3] for i in range(len(value) - 2)}
+
+    def _to_bitmap(self, positions) -> int:
+        # Set bits in a byte buffer, OR-ing into a big int per bit is quadratic
+        buffer = bytearray(len(self.merchant_ids) // 8 + 1)
+        for position in positions:
+            buffer[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(buffer, "little")
+
+    def _prefix_range(self, field: str, prefix: str) -> tuple:
+        values = self._sorted_values[field]
+        start = bisect.bisect_left(values, prefix)
+        end = bisect.bisect_left(values, prefix + "\U0010ffff", start)
+        return start, end
+
+    def _contains_candidates(self, field: str, text: str) -> set:
+        # Positions holding every trigram of text, a superset of the matches
+        if len(text) < 3:
+            raise ValueError(
+                "contains needs at least 3 characters, "
+                "use prefix for shorter text"
+            )
+        trigrams = self._trigrams[field]
+        postings = sorted(
+            (trigrams.get(t, set()) for t in self._trigrams_of(text)),
+            key=len,
+        )
+        return set.intersection(*postings)
+
+    def _contains_positions(self, field: str, text: str) -> List[int]:
+        values = self._values[field]
+        return [
+            p
+            for p in self._contains_candidates(field, text)
+            if text in values[p]
+        ]
+
+    def _contains_ranks(
+        self, field: str, text: str, start: int, end: int
+    ) -> List[int]:
+        # Matches inside the prefix range, checking whichever is smaller:
+        # the range itself or the trigram candidates
+        candidates = self._contains_candidates(field, text)
+        if end - start <= len(candidates):
+            values = self._sorted_values[field]
+            return [r for r in range(start, end) if text in values[r]]
+        values = self._values[field]
+        rank_of = self._rank_of[field]
+        return [
+            rank_of[p]
+            for p in candidates
+            if start <= rank_of[p] < end and text in values[p]
+        ]
+
+    @staticmethod
+    def _filter_bitmap(
+        facets: Dict[str, Dict[Any, int]], filters: Dict[str, Any], bitmap: int
+    ) -> int:
+        for field, wanted in filters.items():
+            if field not in facets:
+                raise ValueError(f"Unknown facet field: {field}")
+            if not isinstance(wanted, (list, tuple, set)):
+                wanted = [wanted]
+            matching = 0
+            for value in wanted:
+                matching |= facets[field].get(value, 0)
+            bitmap &= matching
+        return bitmap
+
+    @staticmethod
+    def _count_facets(
+        facets: Dict[str, Dict[Any, int]], bitmap: Optional[int]
+    ) -> Dict[str, Dict]:
+        counts = {}
+        for field, facet in facets.items():
+            counts[field] = {}
+            for value, value_bitmap in facet.items():
+                if bitmap is not None:
+                    value_bitmap &= bitmap
+                if value_bitmap:
+                    counts[field][value] = value_bitmap.bit_count()
+        return counts
+
+    def _bitmap_positions(
+        self, bitmap: int, limit: Optional[int]
+    ) -> List[int]:
+        # Let the regex engine skip zero bytes, then read the set bits of
+        # each non-zero byte, stopping as soon as the limit is reached
+        buffer = bitmap.to_bytes(len(self.merchant_ids) // 8 + 1, "little")
+        positions = []
+        for match in _NON_ZERO_BYTE.finditer(buffer):
+            offset = match.start() * 8
+            byte = buffer[match.start()]
+            while byte:
+                if limit is not None and len(positions) >= limit:
+                    return positions
+                low = byte & -byte
+                positions.append(offset + low.bit_length() - 1)
+                byte ^= low
+        return positions
+
+    def facet_counts(self, bitmap: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        Count merchants per facet value
+
+        Args:
+            bitmap: Optional bitmap of positions to count within
+
+        Returns:
+            Dictionary of {facet field: {value: merchant count}}
+        """
+        return self._count_facets(self._facets, bitmap)
+
+    def query(
+        self,
+        prefix: Optional[str] = None,
+        contains: Optional[str] = None,
+        field: str = "name",
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = DEFAULT_SEARCH_LIMIT,
+    ) -> Dict[str, Any]:
+        """
+        Find merchants by text and facet values
+
+        Args:
+            prefix: Optional case-insensitive prefix of the text field
+            contains: Optional case-insensitive substring of the text field,
+                at least 3 characters long (shorter text raises ValueError)
+            field: Text field prefix and contains apply to
+            filters: Optional {facet field: value or list of values}
+            limit: Maximum number of merchant ids returned, None for all and
+                0 for counts only
+
+        Returns:
+            Dictionary with up to limit matching merchant_ids, the total
+            number of matches and facet_counts over all matches. Prefix
+            matches are ordered by field value, other matches by their
+            position in the snapshot
+        """
+        if (prefix is not None or contains is not None) and (
+            field not in self.TEXT_FIELDS
+        ):
+            raise ValueError(f"Unknown text field: {field}")
+
+        if prefix is None:
+            # Work over snapshot positions
+            facets = self._facets
+            bitmap = self._filter_bitmap(facets, filters or {}, self._all)
+            if contains is not None:
+                bitmap &= self._to_bitmap(
+                    self._contains_positions(field, self._normalize(contains))
+                )
+            positions = self._bitmap_positions(bitmap, limit)
+        else:
+            # Work over the field's sorted order, where the prefix matches
+            # are the bits from start to end
+            start, end = self._prefix_range(field, self._normalize(prefix))
+            facets = self._rank_facets[field]
+            bitmap = ((1 << end) - 1) ^ ((1 << start) - 1)
+            bitmap = self._filter_bitmap(facets, filters or {}, bitmap)
+            if contains is not None:
+                bitmap &= self._to_bitmap(
+                    self._contains_ranks(
+                        field, self._normalize(contains), start, end
+                    )
+                )
+            sorted_positions = self._sorted_positions[field]
+            positions = [
+                sorted_positions[rank]
+                for rank in self._bitmap_positions(bitmap, limit)
+            ]
+
+        return {
+            "merchant_ids": [
+                self.merchant_ids[position] for position in positions
+            ],
+            "total": bitmap.bit_count(),
+            "facet_counts": self._count_facets(facets, bitmap),
+        }
+
+
+async def fetch_merchant_row(
+    api: PayEngineMerchantAPI, merchant: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Fetch all sub-resources for one merchant into a snapshot row
+
+    Args:
+        api: An open PayEngineMerchantAPI client
+        merchant: Merchant fields from the merchant list
+
+    Returns:
+        Merchant row in the merchant_data.json format
+    """
+    # Save all merchant fields in the output dictionary
+    merchant_row = {
+        "merchant_id": merchant.get("id"),
+        "merchant_data": merchant,  # All fields from the merchant list
+        "details": None,  # Placeholder for future merchant-specific data
+        "documents": None,  # Will be populated with document API call
+        "bank_accounts": None,  # Will be populated with bank accounts API call
+        "devices": None,  # Will be populated with devices API call
+        "payment_links": None,  # Will be populated with payment links API call
+        "recurring_payment_plans": None,  # Will be populated with recurring payment plans API call
+        "gateways": None,  # Will be populated with gateways API call
+        "transactions": None,  # Will be populated with transactions API call
+    }
+
+    # Get document information for this merchant
+    if merchant.get("id"):
+        documents = await api.get_merchant_documents(merchant["id"])
+        merchant_row["documents"] = documents
+
+    # Get bank account information for this merchant
+    if merchant.get("id"):
+        bank_accounts = await api.get_merchant_bank_accounts(
+            merchant["id"]
+        )
+        merchant_row["bank_accounts"] = bank_accounts
+
+    # Get devices information for this merchant
+    if merchant.get("id"):
+        devices = await api.get_merchant_devices(merchant["id"])
+        merchant_row["devices"] = devices
+
+    # Get payment links information for this merchant
+    if merchant.get("id"):
+        payment_links = await api.get_merchant_payment_links(
+            merchant["id"]
+        )
+        merchant_row["payment_links"] = payment_links
+
+    # Get recurring payment plans information for this merchant
+    if merchant.get("id"):
+        recurring_payment_plans = await api.get_merchant_recurring_payment_plans(
+            merchant["id"]
+        )
+        merchant_row["recurring_payment_plans"] = recurring_payment_plans
+
+    # Get gateways information for this merchant
+    if merchant.get("id"):
+        gateways = await api.get_merchant_gateways(merchant["id"])
+        merchant_row["gateways"] = gateways
+
+    # Get transactions information for this merchant
+    if merchant.get("id"):
+        transactions = await api.get_merchant_transactions(merchant["id"])
+        merchant_row["transactions"] = transactions
+
+    # Get detailed information for this merchant
+    if merchant.get('id'):
+        details = await api.get_merchant_details(merchant['id'])
+        merchant_row["details"] = details
+
+    return merchant_row
+
+
 async def fetch_all_merchant_data(
-    base_url: str, api_key: Optional[str] = None
+    base_url: str,
+    api_key: Optional[str] = None,
+    tracer: Optional[TimelineTracer] = None,
 ) -> Dict[str, Any]:
     """
     Fetch all merchant data including details for each merchant
@@ -467,103 +1292,185 @@ async def fetch_all_merchant_data(
     Args:
         base_url: The base URL of the PayEngine API
         api_key: Optional API key for authentication
+        tracer: Optional timeline tracer used in profiling mode
+
+    Returns:
+        Dictionary containing all merchant data with nested structure
+    """
+    async with PayEngineMerchantAPI(base_url, api_key, tracer) as api:
+        return await collect_merchant_data(api)
+
+
+async def collect_merchant_data(
+    api: PayEngineMerchantAPI, merchant_concurrency: int = 1
+) -> Dict[str, Any]:
+    """
+    Fetch all merchant data through an open API client
+
+    Args:
+        api: An open PayEngineMerchantAPI client
+        merchant_concurrency: Number of merchants fetched at the same time
 
     Returns:
         Dictionary containing all merchant data with nested structure
     """
+    if merchant_concurrency < 1:
+        raise ValueError("merchant_concurrency must be at least 1")
+
     print("Starting merchant data extraction...")
+    tracer = api.tracer
 
-    async with PayEngineMerchantAPI(base_url, api_key) as api:
-        # Get all merchants
-        merchants = await api.get_merchants()
-
-        if not merchants:
-            return {
-                "extraction_time": datetime.now().isoformat(),
-                "status": "error",
-                "message": "No merchants found or error occurred",
-                "merchants": [],
-                "total_merchants": 0,
-            }
+    # Get all merchants
+    merchants = await api.get_merchants()
 
-        # Create the main data structure
-        result = {
+    if not merchants:
+        return {
             "extraction_time": datetime.now().isoformat(),
-            "status": "success",
-            "message": f"Successfully extracted data for {len(merchants)} merchants",
-            "total_merchants": len(merchants),
+            "status": "error",
+            "message": "No merchants found or error occurred",
             "merchants": [],
+            "total_merchants": 0,
+            "portfolio_rollups": PortfolioRollups().to_dict(),
         }
 
-        # Process each merchant
-        for i, merchant in enumerate(merchants, 1):
+    # Create the main data structure
+    result = {
+        "extraction_time": datetime.now().isoformat(),
+        "status": "success",
+        "message": f"Successfully extracted data for {len(merchants)} merchants",
+        "total_merchants": len(merchants),
+        "merchants": [],
+    }
+
+    # Portfolio aggregates, updated as each merchant completes
+    rollups = PortfolioRollups()
+    semaphore = asyncio.Semaphore(merchant_concurrency)
+
+    async def process_merchant(i: int, merchant: Dict[str, Any]):
+        async with semaphore:
             print(
                 f"Processing merchant {i}/{len(merchants)}: {merchant.get('id', 'Unknown ID')}"
             )
-            # Save all merchant fields in the output dictionary
-            merchant_row = {
-                "merchant_id": merchant.get("id"),
-                "merchant_data": merchant,  # All fields from the merchant list
-                "details": None,  # Placeholder for future merchant-specific data
-                "documents": None,  # Will be populated with document API call
-                "bank_accounts": None,  # Will be populated with bank accounts API call
-                "devices": None,  # Will be populated with devices API call
-                "payment_links": None,  # Will be populated with payment links API call
-                "recurring_payment_plans": None,  # Will be populated with recurring payment plans API call
-                "gateways": None,  # Will be populated with gateways API call
-                "transactions": None,  # Will be populated with transactions API call
-            }
-            
-            # Get document information for this merchant
-            if merchant.get("id"):
-                documents = await api.get_merchant_documents(merchant["id"])
-                merchant_row["documents"] = documents
-            
-            # Get bank account information for this merchant
-            if merchant.get("id"):
-                bank_accounts = await api.get_merchant_bank_accounts(
-                    merchant["id"]
+            merchant_start = tracer.now() if tracer else None
+            merchant_row = await fetch_merchant_row(api, merchant)
+            rollups.add_merchant(merchant, merchant_row["transactions"])
+
+            if tracer:
+                tracer.add_span(
+                    f"merchant {i}/{len(merchants)}",
+                    "merchant",
+                    merchant.get("id"),
+                    merchant_start,
+                    tracer.now(),
                 )
-                merchant_row["bank_accounts"] = bank_accounts
-            
-            # Get devices information for this merchant
-            if merchant.get("id"):
-                devices = await api.get_merchant_devices(merchant["id"])
-                merchant_row["devices"] = devices
-            
-            # Get payment links information for this merchant
-            if merchant.get("id"):
-                payment_links = await api.get_merchant_payment_links(
-                    merchant["id"]
-                )
-                merchant_row["payment_links"] = payment_links
-            
-            # Get recurring payment plans information for this merchant
-            if merchant.get("id"):
-                recurring_payment_plans = await api.get_merchant_recurring_payment_plans(
-                    merchant["id"]
-                )
-                merchant_row["recurring_payment_plans"] = recurring_payment_plans
-            
-            # Get gateways information for this merchant
-            if merchant.get("id"):
-                gateways = await api.get_merchant_gateways(merchant["id"])
-                merchant_row["gateways"] = gateways
-            
-            # Get transactions information for this merchant
-            if merchant.get("id"):
-                transactions = await api.get_merchant_transactions(merchant["id"])
-                merchant_row["transactions"] = transactions
-            
-            # Get detailed information for this merchant
-            if merchant.get('id'):
-                details = await api.get_merchant_details(merchant['id'])
-                merchant_row["details"] = details
-            
-            result["merchants"].append(merchant_row)
+            return merchant_row
+
+    # Process each merchant, keeping rows in merchant list order
+    result["merchants"] = list(
+        await asyncio.gather(
+            *(
+                process_merchant(i, merchant)
+                for i, merchant in enumerate(merchants, 1)
+            )
+        )
+    )
+    result["portfolio_rollups"] = rollups.to_dict()
 
-        print(f"Completed data extraction for {len(merchants)} merchants")
-        return result
+    print(f"Completed data extraction for {len(merchants)} merchants")
+    return result
+
+
+# Multi-tenant extraction defaults
+MULTI_TENANT_MAX_CONCURRENCY = 16
+
+# Tenant names are used in output filenames
+TENANT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+async def extract_multi_tenant_merchant_data(
+    tenants: List[Dict[str, Any]],
+    max_concurrency: int = MULTI_TENANT_MAX_CONCURRENCY,
+    merchant_concurrency: Optional[int] = None,
+    output_dir: str = ".",
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Extract merchant data for many partner accounts in one run
+
+    All tenants share one connection pool and one in-flight request budget,
+    granted round-robin across tenants. Each tenant's data is written to
+    merchant_data_<name>.json in output_dir.
+
+    Args:
+        tenants: Tenant configs with "name", "base_url" and optional "api_key"
+        max_concurrency: Maximum requests in flight across all tenants
+        merchant_concurrency: Merchants fetched at the same time per tenant,
+            defaults to max_concurrency so the shared budget throttles
+        output_dir: Directory the per-tenant JSON files are written to
+
+    Returns:
+        Dictionary of merchant data keyed by tenant name
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    if merchant_concurrency is not None and merchant_concurrency < 1:
+        raise ValueError("merchant_concurrency must be at least 1")
+    if not isinstance(tenants, list):
+        raise ValueError("Tenants must be a list of tenant objects")
+    names = set()
+    for tenant in tenants:
+        if not isinstance(tenant, dict):
+            raise ValueError("Tenants must be a list of tenant objects")
+        if not tenant.get("name") or not tenant.get("base_url"):
+            raise ValueError("Each tenant requires a name and a base_url")
+        name = tenant["name"]
+        if not isinstance(name, str) or not TENANT_NAME_PATTERN.match(name):
+            raise ValueError(
+                f"Invalid tenant name {tenant['name']!r}: "
+                "use only letters, digits, '_' and '-'"
+            )
+        if tenant["name"] in names:
+            raise ValueError(f"Duplicate tenant name: {tenant['name']}")
+        names.add(tenant["name"])
+
+    if merchant_concurrency is None:
+        merchant_concurrency = max_concurrency
+
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+    scheduler = FairRequestScheduler(max_concurrency)
+
+    async def extract_tenant(tenant: Dict[str, Any]) -> Dict[str, Any]:
+        name = tenant["name"]
+        print(f"Starting extraction for tenant {name}")
+        try:
+            async with PayEngineMerchantAPI(
+                tenant["base_url"],
+                tenant.get("api_key"),
+                connector=connector,
+                scheduler=scheduler,
+                tenant=name,
+            ) as api:
+                data = await collect_merchant_data(api, merchant_concurrency)
+        except Exception as e:
+            print(f"Exception while extracting tenant {name}: {e}")
+            data = {"error": str(e)}
+        await save_merchant_data_to_json(
+            data, os.path.join(output_dir, f"merchant_data_{name}.json")
+        )
+        return data
+
+    try:
+        results = await asyncio.gather(
+            *(extract_tenant(tenant) for tenant in tenants)
+        )
+    finally:
+        await connector.close()
+
+    return {tenant["name"]: data for tenant, data in zip(tenants, results)}
+
+
+# Profiling mode output files
+PROFILE_TRACE_FILENAME = "merchant_profile_trace.json"
+PROFILE_CPU_FILENAME = "merchant_profile.prof"
 
 
 async def save_merchant_data_to_json(
@@ -584,9 +1491,96 @@ async def save_merchant_data_to_json(
         print(f"Error saving data to {filename}: {e}")
 
 
-async def main():
+async def load_merchant_data_from_json(
+    filename: str = "merchant_data.json",
+) -> Optional[Dict[str, Any]]:
+    """
+    Load previously saved merchant data from a JSON file
+
+    Args:
+        filename: The filename to load the data from
+
+    Returns:
+        The merchant data, or None if the file is missing or unreadable
+    """
+    if not os.path.exists(filename):
+        return None
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error loading data from {filename}: {e}")
+        return None
+
+
+# Number of snapshot search indexes kept in memory
+MAX_CACHED_SEARCH_INDEXES = 2
+
+# Search indexes of recently queried snapshots, by path, least recent first
+_search_indexes: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def _build_search_index(path: str) -> Optional["MerchantSearchIndex"]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"Error loading data from {path}: {e}")
+        return None
+    merchants = data.get("merchants") if isinstance(data, dict) else None
+    if not isinstance(merchants, list):
+        return None
+    return MerchantSearchIndex.from_snapshot(data)
+
+
+async def get_merchant_search_index(
+    filename: str = "merchant_data.json",
+) -> Optional["MerchantSearchIndex"]:
+    """
+    Get the search index for a snapshot file, building it on first use
+
+    The index is rebuilt in a worker thread when the file has changed since
+    it was built, and only the most recently used snapshots are kept.
+
+    Args:
+        filename: The snapshot file
+
+    Returns:
+        The search index, or None if the snapshot could not be loaded
+    """
+    path = os.path.abspath(filename)
+    try:
+        stat = os.stat(path)
+        modified = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        _search_indexes.pop(path, None)
+        return None
+
+    cached = _search_indexes.get(path)
+    if cached and cached[0] == modified:
+        _search_indexes.move_to_end(path)
+        return cached[1]
+
+    index = await asyncio.get_running_loop().run_in_executor(
+        None, _build_search_index, path
+    )
+    if index is None:
+        _search_indexes.pop(path, None)
+        return None
+    _search_indexes[path] = (modified, index)
+    _search_indexes.move_to_end(path)
+    while len(_search_indexes) > MAX_CACHED_SEARCH_INDEXES:
+        _search_indexes.popitem(last=False)
+    return index
+
+
+async def main(profile: bool = False, profile_cpu: bool = False):
     """
     Main function to run the merchant data extraction
+
+    Args:
+        profile: Record a Chrome trace-event timeline of the extraction
+        profile_cpu: Also collect a cProfile dump of CPU hot spots
     """
     # Delete previous output file if it exists
     output_filename = "merchant_data.json"
@@ -612,9 +1606,26 @@ async def main():
     print(f"API Key provided: {'Yes' if api_key else 'No'}")
     print("=" * 60)
 
+    tracer = TimelineTracer() if profile else None
+    profiler = cProfile.Profile() if profile_cpu else None
+
     try:
         # Fetch all merchant data
-        merchant_data = await fetch_all_merchant_data(payengine_host, api_key)
+        if profiler:
+            profiler.enable()
+        try:
+            merchant_data = await fetch_all_merchant_data(
+                payengine_host, api_key, tracer
+            )
+        finally:
+            if profiler:
+                profiler.disable()
+
+        if tracer:
+            tracer.save(PROFILE_TRACE_FILENAME)
+        if profiler:
+            profiler.dump_stats(PROFILE_CPU_FILENAME)
+            print(f"CPU profile saved successfully to {PROFILE_CPU_FILENAME}")
 
         # Save to JSON file
         output_filename = "merchant_data.json"
@@ -627,6 +1638,10 @@ async def main():
         print(f"Status: {merchant_data.get('status', 'unknown')}")
         print(f"Message: {merchant_data.get('message', 'No message')}")
         print(f"Total Merchants: {merchant_data.get('total_merchants', 0)}")
+        for rollup_name, rollup in merchant_data.get(
+            "portfolio_rollups", {}
+        ).items():
+            print(f"Portfolio rollup {rollup_name}: {len(rollup)} buckets")
         print(f"Output File: {output_filename}")
 
         # Show sample of extracted data
@@ -760,9 +1775,515 @@ async def extract_merchant_data(
     return await fetch_all_merchant_data(base_url, api_key)
 
 
+# Webhook ingestion defaults
+WEBHOOK_HOST = "127.0.0.1"
+WEBHOOK_PORT = 8080
+WEBHOOK_PATH = "/webhooks/payengine"
+
+# Merchant list fields, refreshed from the per-merchant details record
+MERCHANT_LIST_FIELDS = (
+    "id",
+    "name",
+    "external_id",
+    "email",
+    "processing_status",
+    "feeschedule_id",
+    "gateway_feeschedule_id",
+    "merchant_portal_invite",
+    "created_at",
+    "updated_at",
+    "parent_merchant_id",
+    "group_id",
+    "status",
+    "group_name",
+    "can_process",
+    "mid",
+    "bank_account_verification",
+    "percentage_completed",
+    "total_steps",
+    "steps_completed",
+    "total_payment_volume",
+)
+
+# Longest time, in seconds, patched rows wait to be saved under steady load
+WEBHOOK_SAVE_INTERVAL = 5.0
+
+# Change event types produced by the local event generator
+MERCHANT_CHANGE_EVENTS = (
+    "merchant.created",
+    "merchant.updated",
+    "transaction.created",
+    "transaction.updated",
+)
+
+
+class MerchantChangeQueue:
+    """Queue of merchants awaiting a refetch, deduplicated by merchant id"""
+
+    def __init__(self):
+        """
+        Initialize an empty queue
+        """
+        self._queue = asyncio.Queue()
+        self._pending = set()
+
+    def put(self, merchant_id: str) -> bool:
+        """
+        Queue a merchant unless it is already waiting for a refetch
+
+        Args:
+            merchant_id: The merchant ID that changed
+
+        Returns:
+            True if queued, False if merged into an already pending refetch
+        """
+        if merchant_id in self._pending:
+            return False
+        self._pending.add(merchant_id)
+        self._queue.put_nowait(merchant_id)
+        return True
+
+    async def get(self) -> str:
+        """
+        Wait for the next merchant to refetch
+
+        Returns:
+            The merchant ID; events arriving after this are queued again
+        """
+        merchant_id = await self._queue.get()
+        self._pending.discard(merchant_id)
+        return merchant_id
+
+    def task_done(self):
+        """Mark the merchant returned by get() as refetched"""
+        self._queue.task_done()
+
+    async def join(self):
+        """Wait until every queued merchant has been refetched"""
+        await self._queue.join()
+
+    def empty(self) -> bool:
+        """Whether no merchants are waiting for a refetch"""
+        return self._queue.empty()
+
+
+class WebhookIngestor:
+    """Keeps a merchant snapshot fresh from merchant change events"""
+
+    def __init__(
+        self,
+        api: PayEngineMerchantAPI,
+        snapshot: Dict[str, Any],
+        filename: str = "merchant_data.json",
+    ):
+        """
+        Initialize the ingestor over a loaded snapshot
+
+        Args:
+            api: An open PayEngineMerchantAPI client
+            snapshot: Merchant data in the merchant_data.json format
+            filename: The filename the patched snapshot is saved to
+        """
+        self.api = api
+        self.snapshot = snapshot
+        self.filename = filename
+        self.queue = MerchantChangeQueue()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._rows = {
+            row.get("merchant_id"): row
+            for row in snapshot.get("merchants", [])
+        }
+        self._rollups = PortfolioRollups()
+        for row in self._rows.values():
+            self._rollups.add_merchant(
+                row.get("merchant_data") or {}, row.get("transactions")
+            )
+
+    @staticmethod
+    def _is_merchant_event(event: Dict[str, Any]) -> bool:
+        return event.get("type", "").startswith("merchant.")
+
+    @classmethod
+    def _event_merchant_id(cls, event: Dict[str, Any]) -> Optional[str]:
+        # Accept the merchant id at the top level or inside "data"
+        data = event.get("data")
+        data = data if isinstance(data, dict) else {}
+        if cls._is_merchant_event(event):
+            merchant_id = event.get("merchant_id") or data.get("id")
+        else:
+            merchant_id = event.get("merchant_id") or data.get("merchant_id")
+        # Ids are strings or integers; anything else is not a merchant id
+        if isinstance(merchant_id, bool) or not isinstance(
+            merchant_id, (str, int)
+        ):
+            return None
+        return str(merchant_id).strip() or None
+
+    async def handle_event(self, request: web.Request) -> web.Response:
+        """
+        HTTP handler that queues the merchant referenced by a change event
+
+        Args:
+            request: The incoming webhook request
+
+        Returns:
+            202 with whether the merchant was newly queued, or 400
+        """
+        try:
+            event = await request.json()
+        except Exception as e:
+            return web.json_response(
+                {"error": f"Invalid JSON: {e}"}, status=400
+            )
+
+        if not isinstance(event, dict):
+            return web.json_response(
+                {"error": "Event must be a JSON object"}, status=400
+            )
+        if "type" in event and not isinstance(event["type"], str):
+            return web.json_response(
+                {"error": "Event type must be a string"}, status=400
+            )
+
+        merchant_id = self._event_merchant_id(event)
+        if not merchant_id:
+            return web.json_response(
+                {"error": "Event does not reference a merchant"}, status=400
+            )
+
+        queued = self.queue.put(merchant_id)
+        return web.json_response(
+            {"merchant_id": merchant_id, "queued": queued}, status=202
+        )
+
+    @staticmethod
+    def _details_record(details: Any) -> Optional[Dict[str, Any]]:
+        # The merchant record, bare or wrapped in "data", from details
+        if not isinstance(details, dict) or details.get("error"):
+            return None
+        record = details.get("data", details)
+        return record if isinstance(record, dict) else None
+
+    async def refresh_merchant(self, merchant_id: str):
+        """
+        Refetch one merchant's sub-resources and patch its snapshot row
+
+        Only per-merchant endpoints are called; list fields are refreshed
+        from the merchant's details record.
+
+        Args:
+            merchant_id: The merchant ID to refetch
+        """
+        old_row = self._rows.get(merchant_id)
+        if old_row:
+            merchant = old_row.get("merchant_data") or {"id": merchant_id}
+        else:
+            # Only add merchants the API knows about
+            record = self._details_record(
+                await self.api.get_merchant_details(merchant_id)
+            )
+            if record is None:
+                print(f"Merchant {merchant_id} not found, skipping change event")
+                return
+            merchant = {"id": merchant_id}
+
+        row = await fetch_merchant_row(self.api, merchant)
+
+        # Refresh list fields (name, status, group...) from the details
+        # record, keeping the previous values if details could not be read
+        record = self._details_record(row["details"])
+        if record is not None:
+            merchant = {
+                **merchant,
+                **{
+                    field: record[field]
+                    for field in MERCHANT_LIST_FIELDS
+                    if field in record
+                },
+            }
+            row["merchant_data"] = merchant
+        elif not old_row:
+            print(f"Merchant {merchant_id} details unavailable, skipping")
+            return
+
+        if old_row:
+            self._rollups.remove_merchant(
+                old_row.get("merchant_data") or {}, old_row.get("transactions")
+            )
+            old_row.clear()
+            old_row.update(row)
+        else:
+            self._rows[merchant_id] = row
+            self.snapshot.setdefault("merchants", []).append(row)
+        self._rollups.add_merchant(merchant, row["transactions"])
+        self._dirty = True
+        print(f"Patched snapshot for merchant {merchant_id}")
+
+    async def _save_snapshot(self):
+        total = len(self.snapshot.get("merchants", []))
+        self.snapshot["total_merchants"] = total
+        self.snapshot["message"] = (
+            f"Successfully extracted data for {total} merchants"
+        )
+        self.snapshot["last_update_time"] = datetime.now().isoformat()
+        self.snapshot["portfolio_rollups"] = self._rollups.to_dict()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        await save_merchant_data_to_json(self.snapshot, self.filename)
+
+    async def process_events(self):
+        """
+        Refetch queued merchants, saving patched rows when the queue drains
+        or at least every WEBHOOK_SAVE_INTERVAL seconds under steady load
+        """
+        while True:
+            merchant_id = await self.queue.get()
+            try:
+                await self.refresh_merchant(merchant_id)
+            except Exception as e:
+                print(f"Exception while refreshing merchant {merchant_id}: {e}")
+            finally:
+                self.queue.task_done()
+                overdue = (
+                    time.monotonic() - self._last_save >= WEBHOOK_SAVE_INTERVAL
+                )
+                if self._dirty and (self.queue.empty() or overdue):
+                    await self._save_snapshot()
+
+    def create_app(self) -> web.Application:
+        """
+        Build the aiohttp application serving the webhook endpoint
+
+        Returns:
+            Application with a POST route at WEBHOOK_PATH
+        """
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle_event)
+        return app
+
+
+async def run_webhook_ingestion(
+    base_url: str,
+    api_key: Optional[str] = None,
+    host: str = WEBHOOK_HOST,
+    port: int = WEBHOOK_PORT,
+    filename: str = "merchant_data.json",
+):
+    """
+    Serve the webhook endpoint and patch the saved snapshot as events arrive
+
+    Args:
+        base_url: The base URL of the PayEngine API
+        api_key: Optional API key for authentication
+        host: Host to listen on
+        port: Port to listen on
+        filename: The snapshot file to patch
+
+    Returns:
+        False if no usable snapshot could be prepared; otherwise serves
+        until cancelled
+    """
+    snapshot = await load_merchant_data_from_json(filename)
+    if not snapshot or snapshot.get("status") != "success":
+        print(f"No usable snapshot in {filename}, running a full extraction")
+        snapshot = await fetch_all_merchant_data(base_url, api_key)
+        if snapshot.get("status") != "success":
+            print(
+                f"Error: full extraction failed ({snapshot.get('message', 'unknown error')}), not starting the webhook"
+            )
+            return False
+        await save_merchant_data_to_json(snapshot, filename)
+
+    async with PayEngineMerchantAPI(base_url, api_key) as api:
+        ingestor = WebhookIngestor(api, snapshot, filename)
+        runner = web.AppRunner(ingestor.create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        print(f"Listening for change events on http://{host}:{port}{WEBHOOK_PATH}")
+
+        try:
+            await ingestor.process_events()
+        finally:
+            await runner.cleanup()
+
+
+def _positive_int(value: str) -> int:
+    """argparse type for integers of at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not an integer")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} must be at least 1")
+    return number
+
+
+async def generate_change_events(
+    url: str,
+    merchant_ids: List[str],
+    count: int = 20,
+    interval: float = 0.1,
+):
+    """
+    Post random merchant and transaction change events, for local testing
+
+    Args:
+        url: The webhook endpoint URL
+        merchant_ids: Merchant IDs to generate events for
+        count: Number of events to post
+        interval: Seconds to wait between events
+    """
+    async with aiohttp.ClientSession() as session:
+        for i in range(count):
+            event_type = random.choice(MERCHANT_CHANGE_EVENTS)
+            merchant_id = random.choice(merchant_ids)
+            if event_type.startswith("merchant."):
+                data = {"id": merchant_id}
+            else:
+                data = {"id": f"generated-{i}", "merchant_id": merchant_id}
+            event = {
+                "type": event_type,
+                "created_at": datetime.now().isoformat(),
+                "data": data,
+            }
+            try:
+                async with session.post(url, json=event) as response:
+                    print(
+                        f"Sent {event_type} for merchant {merchant_id}: {response.status} - {await response.text()}"
+                    )
+            except Exception as e:
+                print(f"Exception while sending change event: {e}")
+            await asyncio.sleep(interval)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract PayEngine merchant data to merchant_data.json"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"write a Chrome/Perfetto trace to {PROFILE_TRACE_FILENAME}",
+    )
+    parser.add_argument(
+        "--profile-cpu",
+        action="store_true",
+        help=f"write a cProfile CPU hot spot dump to {PROFILE_CPU_FILENAME}",
+    )
+    parser.add_argument(
+        "--webhook",
+        action="store_true",
+        help="serve a change event endpoint and patch merchant_data.json",
+    )
+    parser.add_argument(
+        "--webhook-host", default=WEBHOOK_HOST, help="webhook listen host"
+    )
+    parser.add_argument(
+        "--webhook-port",
+        type=int,
+        default=WEBHOOK_PORT,
+        help="webhook listen port",
+    )
+    parser.add_argument(
+        "--generate-events",
+        type=int,
+        metavar="COUNT",
+        help="post COUNT test change events to a running webhook endpoint",
+    )
+    parser.add_argument(
+        "--tenants",
+        metavar="FILE",
+        help="JSON list of tenants ({name, base_url, api_key}) to extract",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=_positive_int,
+        default=MULTI_TENANT_MAX_CONCURRENCY,
+        help="with --tenants, requests in flight across all tenants",
+    )
+    parser.add_argument(
+        "--merchant-concurrency",
+        type=_positive_int,
+        help="with --tenants, merchants fetched at once per tenant "
+        "(default: --max-concurrency)",
+    )
+    args = parser.parse_args()
+
+    # Profiling only covers the single-tenant extraction run by main()
+    if (args.profile or args.profile_cpu) and (
+        args.tenants or args.webhook or args.generate_events is not None
+    ):
+        parser.error(
+            "--profile/--profile-cpu cannot be combined with "
+            "--tenants, --webhook or --generate-events"
+        )
+
+    if args.tenants:
+        try:
+            with open(args.tenants, "r", encoding="utf-8") as f:
+                tenants = json.load(f)
+            tenant_results = asyncio.run(
+                extract_multi_tenant_merchant_data(
+                    tenants,
+                    max_concurrency=args.max_concurrency,
+                    merchant_concurrency=args.merchant_concurrency,
+                )
+            )
+        except (OSError, ValueError) as e:
+            print(f"Error: could not run tenants from {args.tenants}: {e}")
+            raise SystemExit(1)
+        failed = [
+            name
+            for name, data in tenant_results.items()
+            if data.get("error") or data.get("status") != "success"
+        ]
+        print(
+            f"\nExtracted {len(tenant_results) - len(failed)}/{len(tenant_results)} tenants"
+        )
+        if failed:
+            print(f"Failed tenants: {', '.join(failed)}")
+        raise SystemExit(1 if failed else 0)
+
+    if args.webhook:
+        payengine_host = os.getenv("PAYENGINE_BASE_URL")
+        if not payengine_host:
+            print("Error: PAYENGINE_BASE_URL environment variable is required")
+            raise SystemExit(1)
+        started = asyncio.run(
+            run_webhook_ingestion(
+                payengine_host,
+                os.getenv("PAYENGINE_PRIVATE_KEY"),
+                args.webhook_host,
+                args.webhook_port,
+            )
+        )
+        raise SystemExit(1 if started is False else 0)
+
+    if args.generate_events is not None:
+        snapshot = asyncio.run(load_merchant_data_from_json())
+        merchant_ids = [
+            row["merchant_id"]
+            for row in (snapshot or {}).get("merchants", [])
+            if row.get("merchant_id")
+        ]
+        if not merchant_ids:
+            print("Error: merchant_data.json has no merchants to generate events for")
+            raise SystemExit(1)
+        asyncio.run(
+            generate_change_events(
+                f"http://{args.webhook_host}:{args.webhook_port}{WEBHOOK_PATH}",
+                merchant_ids,
+                args.generate_events,
+            )
+        )
+        raise SystemExit(0)
+
     # Run the async main function
-    results = asyncio.run(main())
+    results = asyncio.run(
+        main(profile=args.profile, profile_cpu=args.profile_cpu)
+    )
 
     if results and not results.get("error"):
         print("\nMerchant data extraction completed successfully!")
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from merchant import (
+    FairRequestScheduler,
+    MerchantSearchIndex,
+    extract_multi_tenant_merchant_data,
+)
+
+
+def test_fair_scheduler_alternates_between_tenants():
+    async def run():
+        scheduler = FairRequestScheduler(1)
+        order = []
+
+        async def request(tenant):
+            async with scheduler.slot(tenant):
+                order.append(tenant)
+                await asyncio.sleep(0)
+
+        # The large tenant queues all of its requests first
+        tasks = [asyncio.create_task(request("large")) for _ in range(6)]
+        tasks += [asyncio.create_task(request("small")) for _ in range(2)]
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(run())
+    # The first large request takes the free slot, then turns alternate
+    assert order[:5] == ["large", "large", "small", "large", "small"]
+    assert order.count("large") == 6 and order.count("small") == 2
+
+
+def test_fair_scheduler_never_exceeds_limit():
+    async def run():
+        scheduler = FairRequestScheduler(3)
+        in_flight = peak = 0
+
+        async def request(tenant):
+            nonlocal in_flight, peak
+            async with scheduler.slot(tenant):
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.001)
+                in_flight -= 1
+
+        await asyncio.gather(
+            *(request(f"tenant-{i % 4}") for i in range(40))
+        )
+        return peak
+
+    assert asyncio.run(run()) == 3
+
+
+def test_fair_scheduler_skips_cancelled_waiter():
+    async def run():
+        scheduler = FairRequestScheduler(1)
+        release = asyncio.Event()
+        granted = []
+
+        async def holder():
+            async with scheduler.slot("a"):
+                await release.wait()
+
+        async def waiter(tenant):
+            async with scheduler.slot(tenant):
+                granted.append(tenant)
+
+        holding = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(waiter("b"))
+        queued = asyncio.create_task(waiter("c"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+        await asyncio.wait_for(asyncio.gather(holding, queued), 1)
+        return granted, cancelled.cancelled()
+
+    granted, was_cancelled = asyncio.run(run())
+    assert granted == ["c"]
+    assert was_cancelled
+
+
+def test_fair_scheduler_hands_on_slot_granted_before_cancel():
+    async def run():
+        scheduler = FairRequestScheduler(1)
+        granted = []
+
+        async def waiter(tenant):
+            async with scheduler.slot(tenant):
+                granted.append(tenant)
+
+        async with scheduler.slot("a"):
+            first = asyncio.create_task(waiter("b"))
+            second = asyncio.create_task(waiter("c"))
+            await asyncio.sleep(0)
+        # "b" was granted the slot on release; cancel it before it runs
+        first.cancel()
+        await asyncio.wait_for(second, 1)
+        return granted
+
+    assert asyncio.run(run()) == ["c"]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"max_concurrency": 0},
+        {"max_concurrency": -1},
+        {"merchant_concurrency": 0},
+    ],
+)
+def test_multi_tenant_rejects_concurrency_below_one(kwargs):
+    tenants = [{"name": "a", "base_url": "http://127.0.0.1:1"}]
+    with pytest.raises(ValueError):
+        asyncio.run(extract_multi_tenant_merchant_data(tenants, **kwargs))
+
+
+def test_fair_scheduler_rejects_limit_below_one():
+    with pytest.raises(ValueError):
+        FairRequestScheduler(0)
+
+
+def _index_rows():
+    names = ["Beta Shop", "alpha two", "Alpha One", "Gamma", None]
+    statuses = ["approved", "editing", "approved", "approved", "editing"]
+    return [
+        {
+            "merchant_id": f"m{i}",
+            "merchant_data": {"name": name, "status": status},
+        }
+        for i, (name, status) in enumerate(zip(names, statuses))
+    ]
+
+
+def test_search_index_prefix_with_filters_and_facets():
+    index = MerchantSearchIndex(_index_rows())
+
+    result = index.query(prefix="ALPHA")
+    assert result["merchant_ids"] == ["m2", "m1"]
+    assert result["facet_counts"]["status"] == {"approved": 1, "editing": 1}
+
+    result = index.query(prefix="alpha", filters={"status": "approved"})
+    assert result["merchant_ids"] == ["m2"] and result["total"] == 1
+
+    result = index.query(prefix="alpha", contains="two")
+    assert result["merchant_ids"] == ["m1"]
+
+
+def test_search_index_limits_and_counts():
+    index = MerchantSearchIndex(_index_rows())
+
+    result = index.query(filters={"status": "approved"}, limit=2)
+    assert result["merchant_ids"] == ["m0", "m2"] and result["total"] == 3
+    assert index.query(limit=0) == {
+        "merchant_ids": [],
+        "total": 5,
+        "facet_counts": index.facet_counts(),
+    }
+    with pytest.raises(ValueError):
+        index.query(contains="al")